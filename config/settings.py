@@ -2,32 +2,86 @@
 """
 Configuration settings for Matchup Royale
 """
+import logging
 import os
-from typing import Dict, Any
+import sys
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+def _env(name: str, default: Optional[str] = None, **kwargs):
+    """Field factory reading a string setting from the environment"""
+    return field(default_factory=lambda: os.getenv(name, default), **kwargs)
+
+def _env_int(name: str, default: int):
+    """Field factory reading an integer setting from the environment"""
+    return field(default_factory=lambda: int(os.getenv(name, str(default))))
+
+@lru_cache(maxsize=None)
+def _ensure_dir(path: str):
+    """Create a directory once per process; failures are retried next call"""
+    if path:
+        os.makedirs(path, exist_ok=True)
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration class to manage application settings"""
+    """Configuration class to manage application settings
     
-    def __init__(self):
-        # API Configuration
-        self.CLASH_ROYALE_API_TOKEN = os.getenv('CLASH_ROYALE_API_TOKEN')
-        self.API_BASE_URL = os.getenv('API_BASE_URL', 'https://api.clashroyale.com/v1')
-        
-        # Database Configuration
-        self.DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/matchup_royale.db')
-        
-        # Logging Configuration
-        self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-        self.LOG_FILE = os.getenv('LOG_FILE', 'logs/app.log')
+    Environment variables are read once when the instance is built; the
+    module-level ``config`` is the instance the rest of the app shares.
+    """
+    
+    # API Configuration
+    CLASH_ROYALE_API_TOKEN: Optional[str] = _env('CLASH_ROYALE_API_TOKEN', repr=False)
+    API_BASE_URL: str = _env('API_BASE_URL', 'https://api.clashroyale.com/v1')
+    
+    # Database Configuration
+    DATABASE_PATH: str = _env('DATABASE_PATH', 'data/matchup_royale.db')
+    # Any SQLAlchemy URL; defaults to a SQLite file at DATABASE_PATH
+    DATABASE_URL: Optional[str] = _env('DATABASE_URL', repr=False)
+    
+    # API response cache
+    CACHE_DIR: str = _env('CACHE_DIR', 'data/cache')
+    
+    # Logging Configuration
+    LOG_LEVEL: str = _env('LOG_LEVEL', 'INFO')
+    LOG_FILE: str = _env('LOG_FILE', 'logs/app.log')
+    
+    # Data Collection Configuration
+    UPDATE_INTERVAL: int = _env_int('UPDATE_INTERVAL', 3600)  # 1 hour default
+    MAX_RETRIES: int = _env_int('MAX_RETRIES', 3)
+    REQUEST_TIMEOUT: int = _env_int('REQUEST_TIMEOUT', 10)
+    
+    # Built once in __post_init__
+    API_HEADERS: Mapping[str, str] = field(init=False, repr=False, compare=False)
+    _settings: Mapping[str, Any] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        if not self.DATABASE_URL:
+            object.__setattr__(self, 'DATABASE_URL', f"sqlite:///{self.DATABASE_PATH}")
+        if self.CLASH_ROYALE_API_TOKEN:
+            object.__setattr__(self, 'CLASH_ROYALE_API_TOKEN', sys.intern(self.CLASH_ROYALE_API_TOKEN))
         
-        # Data Collection Configuration
-        self.UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', '3600'))  # 1 hour default
-        self.MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
+        # Default headers sent with every API request
+        object.__setattr__(self, 'API_HEADERS', MappingProxyType({
+            'Authorization': f"Bearer {self.CLASH_ROYALE_API_TOKEN}",
+            'Accept': 'application/json'
+        }))
         
+        settings = {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+        object.__setattr__(self, '_settings', MappingProxyType(settings))
+    
+    @property
+    def CLASH_ROYALE_BASE_URL(self) -> str:
+        """Base URL used by the API clients"""
+        return self.API_BASE_URL
+    
     def validate(self) -> bool:
         """Validate configuration settings"""
         errors = []
@@ -36,41 +90,59 @@ class Config:
         if not self.CLASH_ROYALE_API_TOKEN:
             errors.append("CLASH_ROYALE_API_TOKEN is required")
         
-        # Check database directory exists
-        db_dir = os.path.dirname(self.DATABASE_PATH)
-        if db_dir and not os.path.exists(db_dir):
-            try:
-                os.makedirs(db_dir, exist_ok=True)
-            except Exception as e:
-                errors.append(f"Cannot create database directory {db_dir}: {e}")
+        if errors:
+            print("Configuration errors:")
+            for error in errors:
+                print(f"  - {error}")
+            return False
+        
+        return True
+    
+    def ensure_dirs(self) -> bool:
+        """Create the database, cache and log directories if missing"""
+        errors = []
         
-        # Check logs directory exists
-        log_dir = os.path.dirname(self.LOG_FILE)
-        if log_dir and not os.path.exists(log_dir):
+        directories = [
+            ("database", os.path.dirname(self.DATABASE_PATH)),
+            ("cache", self.CACHE_DIR),
+            ("logs", os.path.dirname(self.LOG_FILE)),
+        ]
+        for label, path in directories:
             try:
-                os.makedirs(log_dir, exist_ok=True)
+                _ensure_dir(path)
             except Exception as e:
-                errors.append(f"Cannot create logs directory {log_dir}: {e}")
+                errors.append(f"Cannot create {label} directory {path}: {e}")
         
         if errors:
-            print("Configuration errors:")
+            print("Directory errors:")
             for error in errors:
                 print(f"  - {error}")
             return False
         
         return True
     
-    def get_dict(self) -> Dict[str, Any]:
-        """Return configuration as dictionary"""
-        return {
-            'CLASH_ROYALE_API_TOKEN': self.CLASH_ROYALE_API_TOKEN,
-            'API_BASE_URL': self.API_BASE_URL,
-            'DATABASE_PATH': self.DATABASE_PATH,
-            'LOG_LEVEL': self.LOG_LEVEL,
-            'LOG_FILE': self.LOG_FILE,
-            'UPDATE_INTERVAL': self.UPDATE_INTERVAL,
-            'MAX_RETRIES': self.MAX_RETRIES
-        }
+    def configure_logging(self):
+        """Send matchup_royale.* logs to the console and a rotating LOG_FILE"""
+        logger = logging.getLogger('matchup_royale')
+        if logger.handlers:
+            return
+        
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        handlers = [logging.StreamHandler()]
+        try:
+            _ensure_dir(os.path.dirname(self.LOG_FILE))
+            handlers.append(RotatingFileHandler(self.LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5))
+        except OSError as e:
+            print(f"Cannot open log file {self.LOG_FILE}: {e}")
+        
+        for handler in handlers:
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        logger.setLevel(self.LOG_LEVEL.upper())
+    
+    def get_dict(self) -> Mapping[str, Any]:
+        """Return configuration as a read-only mapping"""
+        return self._settings
 
 # Global configuration instance
-config = Config()
\ No newline at end of file
+config = Config()
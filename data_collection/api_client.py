@@ -1,88 +1,183 @@
+import asyncio
+import httpx
+import logging
+import orjson
+import os
 import requests
+import requests_cache
 import time
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import List, Dict, Optional, Set, Tuple
+from requests.adapters import HTTPAdapter
 from urllib.parse import quote
+from urllib3.util.retry import Retry
 from config.settings import config
 
+logger = logging.getLogger('matchup_royale.api')
+
+@lru_cache(maxsize=131072)
+def _encode_tag(player_tag: str) -> str:
+    """Normalise a player tag to its URL-encoded '%23TAG' form"""
+    clean_tag = player_tag.replace('#', '')
+    return quote(f"#{clean_tag}", safe='')
+
 class RateLimiter:
-    """Simple rate limiter to respect API limits"""
+    """Token bucket rate limiter to respect API limits"""
     def __init__(self, max_requests_per_second: int = 10):
-        self.max_rps = max_requests_per_second
-        self.requests = []
+        self.rate = float(max_requests_per_second)
+        self.tokens = float(max_requests_per_second)
+        self.last = time.monotonic()
     
-    def wait_if_needed(self):
-        now = time.time()
-        # Remove requests older than 1 second
-        self.requests = [req_time for req_time in self.requests if now - req_time < 1]
+    def _acquire(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+        self.last = now
         
-        if len(self.requests) >= self.max_rps:
-            sleep_time = 1 - (now - self.requests[0])
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-        
-        self.requests.append(now)
+        # Going negative reserves a future slot, so the refill on the next
+        # call already accounts for the time spent sleeping here
+        self.tokens -= 1
+        if self.tokens < 0:
+            return -self.tokens / self.rate
+        return 0.0
+    
+    def wait_if_needed(self):
+        sleep_time = self._acquire()
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+
+class AsyncRateLimiter(RateLimiter):
+    """Rate limiter shared by concurrent asyncio tasks"""
+    async def wait_if_needed(self):
+        sleep_time = self._acquire()
+        if sleep_time > 0:
+            await asyncio.sleep(sleep_time)
+
+class RateLimitedRetry(Retry):
+    """urllib3 Retry policy that takes a rate limiter token before each retry
+    
+    urllib3 runs retries inside a single adapter send, so without this they
+    would bypass the token bucket.
+    """
+    def __init__(self, *args, rate_limiter: Optional[RateLimiter] = None, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(*args, **kwargs)
+    
+    def new(self, **kwargs):
+        # urllib3 builds a fresh policy per attempt from the standard params
+        retry = super().new(**kwargs)
+        retry.rate_limiter = self.rate_limiter
+        return retry
+    
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait_if_needed()
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that takes a rate limiter token before each network send
+    
+    CachedSession only reaches the adapter on a cache miss or revalidation,
+    so fresh cache hits are served locally without waiting for a token.
+    Retried attempts take their own token through RateLimitedRetry.
+    """
+    def __init__(self, rate_limiter: RateLimiter, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+    
+    def send(self, request, **kwargs):
+        self.rate_limiter.wait_if_needed()
+        return super().send(request, **kwargs)
+
+# Cache lifetimes in seconds; first matching pattern wins and anything
+# unmatched is not cached. Only player info is cached: battle logs and
+# leaderboards change constantly (the battlelog rule stops '*/players/*'
+# from matching them), and the card list has its own cache in
+# data_collection.cards. Server Cache-Control headers are ignored so these
+# lifetimes are the ones that apply.
+CACHE_EXPIRY = {
+    '*/battlelog': requests_cache.DO_NOT_CACHE,
+    '*/players/*': 3600,
+}
+
+# Responses retried by the HTTP adapter before giving up
+RETRY_STATUSES = [429, 502, 503, 504]
 
 class ClashRoyaleAPI:
     """Clash Royale API client with error handling and rate limiting"""
     
     def __init__(self):
         self.rate_limiter = RateLimiter(max_requests_per_second=10)
-        self.session = requests.Session()
+        # Expired entries carrying an ETag/Last-Modified are revalidated, so an
+        # unchanged resource costs a body-less 304 instead of a full download.
+        # cache_control stays off: it would let a server max-age override
+        # CACHE_EXPIRY, including DO_NOT_CACHE for battle logs.
+        self.session = requests_cache.CachedSession(
+            os.path.join(config.CACHE_DIR, 'api_cache'),
+            backend='sqlite',
+            expire_after=requests_cache.DO_NOT_CACHE,
+            urls_expire_after=CACHE_EXPIRY
+        )
+        retry = RateLimitedRetry(
+            rate_limiter=self.rate_limiter,
+            total=config.MAX_RETRIES,
+            backoff_factor=1,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = RateLimitedAdapter(
+            self.rate_limiter,
+            pool_connections=20,
+            pool_maxsize=50,
+            max_retries=retry
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.session.headers.update(config.API_HEADERS)
+        self._base_url = config.CLASH_ROYALE_BASE_URL
         
         # Statistics
         self.total_requests = 0
         self.failed_requests = 0
         self.rate_limit_hits = 0
     
-    def _make_request(self, endpoint: str, max_retries: int = 3) -> Optional[Dict]:
-        """Make API request with error handling and rate limiting"""
+    def _make_request(self, endpoint: str) -> Optional[Dict]:
+        """Make API request with error handling and rate limiting
         
-        for attempt in range(max_retries):
-            try:
-                # Rate limiting
-                self.rate_limiter.wait_if_needed()
-                
-                # Make request
-                url = f"{config.CLASH_ROYALE_BASE_URL}{endpoint}"
-                response = self.session.get(url, timeout=config.REQUEST_TIMEOUT)
-                
-                self.total_requests += 1
-                
-                if response.status_code == 200:
-                    return response.json()
-                    
-                elif response.status_code == 429:
-                    # Rate limited
-                    self.rate_limit_hits += 1
-                    wait_time = int(response.headers.get('Retry-After', 60))
-                    print(f"⚠️ Rate limited, waiting {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                    
-                elif response.status_code == 404:
-                    # Not found (player doesn't exist or is private)
-                    return None
-                    
-                elif response.status_code == 503:
-                    # Service unavailable (maintenance)
-                    print("⚠️ API maintenance, waiting 5 minutes...")
-                    time.sleep(300)
-                    continue
-                    
-                else:
-                    print(f"❌ API Error {response.status_code}: {response.text}")
-                    self.failed_requests += 1
-                    
-            except requests.exceptions.Timeout:
-                print(f"⚠️ Request timeout (attempt {attempt + 1})")
-                time.sleep(5 * (attempt + 1))
-                
-            except requests.exceptions.RequestException as e:
-                print(f"⚠️ Request error (attempt {attempt + 1}): {e}")
-                time.sleep(5 * (attempt + 1))
+        Rate limiting happens in the session's RateLimitedAdapter, so only
+        requests that reach the network wait for a token. Timeouts, 429s
+        and 5xx responses are retried by the same adapter, which honours
+        Retry-After and keeps the pooled connection alive between attempts.
+        Anything but a 200 is handed to _handle_error_response so the
+        common path stays short.
+        """
+        try:
+            response = self.session.get(self._base_url + endpoint, timeout=config.REQUEST_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Request error for %s: %s", endpoint, e)
+            self.failed_requests += 1
+            return None
         
-        # All retries failed
+        # Fresh cache hits never left the process; revalidations did
+        if not response.from_cache or response.revalidated:
+            self.total_requests += 1
+        if response.status_code == 200:
+            return orjson.loads(response.content)
+        return self._handle_error_response(response, endpoint)
+    
+    def _handle_error_response(self, response: requests.Response, endpoint: str) -> None:
+        """Record a non-200 response that survived the adapter's retries"""
+        if response.status_code == 404:
+            # Not found (player doesn't exist or is private)
+            return None
+        
+        if response.status_code == 429:
+            # Still rate limited after all retries
+            self.rate_limit_hits += 1
+        
+        logger.warning("API error %s for %s: %s", response.status_code, endpoint, response.text)
         self.failed_requests += 1
         return None
     
@@ -92,35 +187,27 @@ class ClashRoyaleAPI:
         if limit:
             endpoint += f"?limit={limit}"
         
-        print(f"🔍 Getting top {limit} players from {location} leaderboard...")
+        logger.info("Getting top %s players from %s leaderboard", limit, location)
         
         data = self._make_request(endpoint)
         if not data or 'items' not in data:
-            print("❌ Failed to get top players")
+            logger.error("Failed to get top players")
             return []
         
         player_tags = [player['tag'] for player in data['items']]
-        print(f"✅ Retrieved {len(player_tags)} top players")
+        logger.info("Retrieved %d top players", len(player_tags))
         return player_tags
     
     def get_player_info(self, player_tag: str) -> Optional[Dict]:
         """Get player information"""
-        # Clean and encode player tag
-        clean_tag = player_tag.replace('#', '')
-        encoded_tag = quote(f"#{clean_tag}", safe='')
-        
-        endpoint = f"/players/{encoded_tag}"
+        endpoint = f"/players/{_encode_tag(player_tag)}"
         
         data = self._make_request(endpoint)
         return data
     
     def get_player_battles(self, player_tag: str) -> List[Dict]:
         """Get battle log for a player"""
-        # Clean and encode player tag
-        clean_tag = player_tag.replace('#', '')
-        encoded_tag = quote(f"#{clean_tag}", safe='')
-        
-        endpoint = f"/players/{encoded_tag}/battlelog"
+        endpoint = f"/players/{_encode_tag(player_tag)}/battlelog"
         
         data = self._make_request(endpoint)
         if not data:
@@ -139,6 +226,10 @@ class ClashRoyaleAPI:
         
         return data['items']
     
+    def clear_cache(self):
+        """Drop all cached API responses"""
+        self.session.cache.clear()
+    
     def get_api_stats(self) -> Dict:
         """Get API usage statistics"""
         return {
@@ -150,16 +241,222 @@ class ClashRoyaleAPI:
     
     def test_connection(self) -> bool:
         """Test API connection and authentication"""
-        print("🧪 Testing API connection...")
+        logger.info("Testing API connection")
         
         # Test with a simple request
         top_players = self.get_top_players(limit=5)
         
         if top_players:
-            print(f"✅ API connection successful! Retrieved {len(top_players)} players")
-            print(f"📊 API Stats: {self.get_api_stats()}")
+            logger.info("API connection successful, retrieved %d players", len(top_players))
+            logger.info("API stats: %s", self.get_api_stats())
             return True
         else:
-            print("❌ API connection failed")
-            print("🔍 Check your API token and IP address configuration")
-            return False
\ No newline at end of file
+            logger.error("API connection failed")
+            logger.error("Check your API token and IP address configuration")
+            return False
+
+# Longest single wait between async retries, in seconds
+MAX_RETRY_WAIT = 60
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> int:
+    """Seconds to wait before the next attempt, honouring Retry-After"""
+    retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+    delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+    return min(delay, MAX_RETRY_WAIT)
+
+class AsyncClashRoyaleAPI:
+    """Asyncio Clash Royale API client for fetching many players concurrently"""
+    
+    def __init__(self, max_batch: int = 50, wait_ms: int = 10, max_connections: int = 1):
+        self.rate_limiter = AsyncRateLimiter(max_requests_per_second=10)
+        self.player_loader = PlayerLoader(self, max_batch=max_batch, wait_ms=wait_ms)
+        # HTTP/2 multiplexes concurrent requests as streams on one connection,
+        # so a single TLS handshake serves the whole run. Default headers are
+        # merged once here rather than per request.
+        self.client = httpx.AsyncClient(
+            http2=True,
+            base_url=config.CLASH_ROYALE_BASE_URL,
+            headers=config.API_HEADERS,
+            timeout=config.REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=max_connections, max_connections=max_connections)
+        )
+        
+        # Statistics
+        self.total_requests = 0
+        self.failed_requests = 0
+        self.rate_limit_hits = 0
+        self.http_version = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    async def close(self):
+        """Close the underlying HTTP connection pool"""
+        await self.client.aclose()
+    
+    async def _make_request(self, endpoint: str) -> Optional[Dict]:
+        """Make API request with error handling and rate limiting
+        
+        Timeouts, transport errors and RETRY_STATUSES are retried up to
+        config.MAX_RETRIES attempts in total; any other error status fails
+        straight away.
+        """
+        
+        for attempt in range(config.MAX_RETRIES):
+            is_last_attempt = attempt + 1 == config.MAX_RETRIES
+            try:
+                # Rate limiting
+                await self.rate_limiter.wait_if_needed()
+                
+                # Make request (relative to the client's base_url)
+                response = await self.client.get(endpoint)
+                
+            except httpx.TimeoutException:
+                logger.debug("Request timeout for %s (attempt %d)", endpoint, attempt + 1)
+                if not is_last_attempt:
+                    await asyncio.sleep(_retry_delay(attempt))
+                continue
+                
+            except httpx.HTTPError as e:
+                logger.debug("Request error for %s (attempt %d): %s", endpoint, attempt + 1, e)
+                if not is_last_attempt:
+                    await asyncio.sleep(_retry_delay(attempt))
+                continue
+            
+            self.total_requests += 1
+            if self.http_version is None:
+                self._record_http_version(response)
+            
+            if response.status_code == 200:
+                return orjson.loads(response.content)
+            
+            if response.status_code == 404:
+                # Not found (player doesn't exist or is private)
+                return None
+            
+            if response.status_code not in RETRY_STATUSES:
+                # Bad request, bad token, etc.: retrying won't help
+                logger.warning("API error %s for %s: %s", response.status_code, endpoint, response.text)
+                self.failed_requests += 1
+                return None
+            
+            if response.status_code == 429:
+                self.rate_limit_hits += 1
+            
+            if not is_last_attempt:
+                wait_time = _retry_delay(attempt, response)
+                logger.warning("API error %s for %s, retrying in %s seconds",
+                               response.status_code, endpoint, wait_time)
+                await asyncio.sleep(wait_time)
+        
+        # All retries failed
+        logger.warning("Giving up on %s after %d attempts", endpoint, config.MAX_RETRIES)
+        self.failed_requests += 1
+        return None
+    
+    def _record_http_version(self, response: httpx.Response):
+        self.http_version = response.http_version
+        if self.http_version != 'HTTP/2':
+            # Without multiplexing, requests queue on max_connections sockets
+            logger.warning("Server negotiated %s instead of HTTP/2; consider raising max_connections",
+                           self.http_version)
+    
+    async def get_player_info(self, player_tag: str) -> Optional[Dict]:
+        """Get player information"""
+        endpoint = f"/players/{_encode_tag(player_tag)}"
+        
+        return await self._make_request(endpoint)
+    
+    async def get_player_battles(self, player_tag: str) -> List[Dict]:
+        """Get battle log for a player"""
+        endpoint = f"/players/{_encode_tag(player_tag)}/battlelog"
+        
+        data = await self._make_request(endpoint)
+        if not data:
+            return []
+        
+        # Return the battles list
+        return data if isinstance(data, list) else []
+    
+    async def get_players_info_bulk(self, player_tags: List[str]) -> List[Optional[Dict]]:
+        """Get player information for many tags concurrently, in input order"""
+        return await self.player_loader.load_many(player_tags)
+    
+    def get_api_stats(self) -> Dict:
+        """Get API usage statistics"""
+        return {
+            'total_requests': self.total_requests,
+            'failed_requests': self.failed_requests,
+            'rate_limit_hits': self.rate_limit_hits,
+            'success_rate': (self.total_requests - self.failed_requests) / max(self.total_requests, 1) * 100,
+            'http_version': self.http_version
+        }
+
+class PlayerLoader:
+    """Coalesces player lookups into concurrent batches
+    
+    Tags passed to load() within wait_ms of each other, or until max_batch
+    have queued up, are fetched together; repeated tags in a batch share a
+    single request. Throughput is still governed by the API's rate limiter.
+    """
+    
+    def __init__(self, api: AsyncClashRoyaleAPI, max_batch: int = 50, wait_ms: int = 10):
+        self.api = api
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000
+        self._queue: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def load(self, player_tag: str) -> Optional[Dict]:
+        """Get player information, batched with other pending lookups"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((player_tag, future))
+        
+        if len(self._queue) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.wait, self._dispatch)
+        
+        return await future
+    
+    async def load_many(self, player_tags: List[str]) -> List[Optional[Dict]]:
+        """Get player information for many tags, in input order"""
+        return await asyncio.gather(*[self.load(tag) for tag in player_tags])
+    
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+        if self._queue:
+            self._timer = asyncio.get_running_loop().call_later(self.wait, self._dispatch)
+        
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        waiters: Dict[str, List[asyncio.Future]] = {}
+        for player_tag, future in batch:
+            waiters.setdefault(player_tag.replace('#', ''), []).append(future)
+        
+        results = await asyncio.gather(
+            *[self.api.get_player_info(tag) for tag in waiters],
+            return_exceptions=True
+        )
+        
+        for futures, result in zip(waiters.values(), results):
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,69 @@
+"""
+Card metadata cached on disk, plus lookups built from it.
+
+The card list changes only when the game adds cards, so it is fetched at
+most once a day and shared by every collector run through a JSON file in
+CACHE_DIR. ``CARD_ID_BY_NAME`` is resolved lazily on first access so that
+importing this module never touches the network.
+"""
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import orjson
+
+from config.settings import config
+from data_collection.api_client import ClashRoyaleAPI
+from database.models import encode_deck
+
+# How long the on-disk card list is trusted, in seconds
+CARDS_TTL = 86400
+
+def _cards_path() -> Path:
+    return Path(config.CACHE_DIR) / 'cards.json'
+
+@lru_cache(maxsize=1)
+def _api() -> ClashRoyaleAPI:
+    # One client (and one CachedSession) for every refresh in the process
+    return ClashRoyaleAPI()
+
+@lru_cache(maxsize=1)
+def load_cards() -> List[Dict]:
+    """Get all cards, from the disk cache when it is fresh enough"""
+    path = _cards_path()
+    if path.exists() and time.time() - path.stat().st_mtime < CARDS_TTL:
+        return orjson.loads(path.read_bytes())
+
+    cards = _api().get_cards()
+    if cards:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(orjson.dumps(cards))
+        return cards
+
+    # API unavailable: a stale list beats none
+    if path.exists():
+        return orjson.loads(path.read_bytes())
+
+    # Raising keeps lru_cache from memoizing the failure
+    raise RuntimeError("Could not load card list from the API or cache")
+
+@lru_cache(maxsize=1)
+def _card_id_by_name() -> Dict[str, int]:
+    return {card['name']: card['id'] for card in load_cards()}
+
+def __getattr__(name: str):
+    if name == 'CARD_ID_BY_NAME':
+        return _card_id_by_name()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def encode_deck_names(card_names: Iterable[str]) -> bytes:
+    """Pack a deck given by card names; see database.models.encode_deck"""
+    card_ids = _card_id_by_name()
+    return encode_deck(card_ids[name] for name in card_names)
+
+def clear_cards_cache():
+    """Forget the in-memory card list and delete the on-disk copy"""
+    load_cards.cache_clear()
+    _card_id_by_name.cache_clear()
+    _cards_path().unlink(missing_ok=True)
@@ -1,11 +1,35 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, SmallInteger, Boolean, Index
+import struct
+from functools import lru_cache
+from typing import Iterable, Iterator, List
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, LargeBinary, SmallInteger, Boolean, Index, event, inspect, select, func, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from datetime import datetime
 from config.settings import config
 
 Base = declarative_base()
 
+# Rows per INSERT round trip when bulk loading battles
+BULK_INSERT_BATCH_SIZE = 1000
+
+# Rows fetched per round trip when streaming battles for analysis
+STREAM_BATCH_SIZE = 5000
+
+# Decks are stored as 8 sorted little-endian uint32 card IDs. Clash Royale
+# card IDs (e.g. 26000000) do not fit in 16 bits, hence 4 bytes per card.
+DECK_SIZE = 8
+_DECK_STRUCT = struct.Struct(f'<{DECK_SIZE}I')
+
+# Dialects that support INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    'postgresql': postgresql_insert,
+    'sqlite': sqlite_insert,
+}
+
 class Battle(Base):
     __tablename__ = 'battles'
     
@@ -22,14 +46,14 @@ class Battle(Base):
     p1_tag = Column(String(20), nullable=False)
     p1_name = Column(String(100))
     p1_trophies = Column(SmallInteger)
-    p1_deck = Column(Text)  # JSON string of card names
+    p1_deck = Column(LargeBinary(_DECK_STRUCT.size))  # packed card IDs, see encode_deck()
     p1_crowns = Column(SmallInteger)
     
     # Player 2 (opponent)
     p2_tag = Column(String(20), nullable=False)
     p2_name = Column(String(100))
     p2_trophies = Column(SmallInteger)
-    p2_deck = Column(Text)  # JSON string of card names
+    p2_deck = Column(LargeBinary(_DECK_STRUCT.size))  # packed card IDs, see encode_deck()
     p2_crowns = Column(SmallInteger)
     
     # Battle outcome
@@ -38,14 +62,35 @@ class Battle(Base):
     # Metadata
     collected_at = Column(DateTime, default=datetime.utcnow)
     
-    # Define indexes for better query performance
+    # Define indexes for better query performance. Every index is maintained
+    # on each insert, so only indexes that serve real lookups are kept.
     __table_args__ = (
         Index('idx_battle_time', 'battle_time'),
-        Index('idx_players', 'p1_tag', 'p2_tag'),
-        Index('idx_game_mode', 'game_mode'),
-        Index('idx_trophies', 'p1_trophies', 'p2_trophies'),
+        # Recent battles for a player; on PostgreSQL the INCLUDE columns let
+        # these lookups be answered with an index-only scan
+        Index('idx_p1_recent', p1_tag, battle_time.desc(),
+              postgresql_include=['winner', 'p1_deck', 'p2_deck']),
+        Index('idx_p2_recent', p2_tag, battle_time.desc(),
+              postgresql_include=['winner', 'p1_deck', 'p2_deck']),
+        Index('idx_battle_p1_trophies', 'p1_trophies'),
+        Index('idx_battle_p2_trophies', 'p2_trophies'),
     )
 
+def encode_deck(card_ids: Iterable[int]) -> bytes:
+    """Pack a deck's card IDs so identical decks encode to identical bytes"""
+    card_ids = sorted(card_ids)
+    if len(card_ids) != DECK_SIZE:
+        raise ValueError(f"Deck must have {DECK_SIZE} cards, got {len(card_ids)}")
+    return _DECK_STRUCT.pack(*card_ids)
+
+def decode_deck(deck: bytes) -> List[int]:
+    """Unpack a stored deck into its sorted card IDs"""
+    return list(_DECK_STRUCT.unpack(deck))
+
+# Battle indexes replaced by the ones above; see migrate_battle_indexes().
+# idx_trophies is dropped only from battles, as players reuses the name.
+LEGACY_BATTLE_INDEXES = ('idx_players', 'idx_game_mode', 'idx_trophies')
+
 class Player(Base):
     __tablename__ = 'players'
     
@@ -86,30 +131,67 @@ class CollectionStats(Base):
     collection_time_minutes = Column(Integer)
 
 # Database connection and session management
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# writer, and synchronous=NORMAL only fsyncs at WAL checkpoints.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA mmap_size=268435456;"
+    "PRAGMA cache_size=-64000;"
+)
+
+def _set_sqlite_pragmas(dbapi_conn, _connection_record):
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.executescript(SQLITE_PRAGMAS)
+    finally:
+        cursor.close()
+
+@lru_cache(maxsize=None)
 def get_database_engine():
-    """Create database engine"""
+    """Create the database engine, shared by all sessions in the process"""
     if not config.DATABASE_URL:
         raise ValueError("DATABASE_URL not configured")
     
-    engine = create_engine(
-        config.DATABASE_URL,
-        echo=False,  # Set to True for SQL debugging
-        pool_size=10,
-        max_overflow=20,
-        pool_pre_ping=True  # Verify connections before use
-    )
+    url = make_url(config.DATABASE_URL)
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(
+            url,
+            echo=False,  # Set to True for SQL debugging
+            pool_size=10,
+            max_overflow=20,
+            pool_pre_ping=True  # Verify connections before use
+        )
+    
+    if url.database in (None, '', ':memory:'):
+        # In-memory databases live and die with their connection, so every
+        # session must share the same one
+        engine = create_engine(
+            url,
+            echo=False,
+            poolclass=StaticPool,
+            connect_args={'check_same_thread': False}
+        )
+    else:
+        engine = create_engine(url, echo=False)
+    
+    event.listen(engine, 'connect', _set_sqlite_pragmas)
     return engine
 
 def create_tables():
     """Create all database tables"""
     try:
         engine = get_database_engine()
+        # Must run first: an old battles.idx_trophies blocks players.idx_trophies
+        migrate_battle_indexes(engine)
         Base.metadata.create_all(engine)
         print("✅ Database tables created successfully")
         
         # Test connection
         with engine.connect() as conn:
-            result = conn.execute("SELECT 1")
+            conn.execute(text("SELECT 1"))
             print("✅ Database connection test successful")
         
         return True
@@ -117,26 +199,115 @@ def create_tables():
         print(f"❌ Error creating tables: {e}")
         return False
 
+def _check_deck_columns(inspector):
+    """Refuse a battles table whose deck columns predate packed decks"""
+    columns = {column['name']: column['type'] for column in inspector.get_columns(Battle.__tablename__)}
+    stale = [name for name in ('p1_deck', 'p2_deck') if not isinstance(columns.get(name), LargeBinary)]
+    if stale:
+        # Old rows hold JSON card-name lists, which can't be converted to
+        # card IDs in SQL, so the table has to be rebuilt or converted offline
+        raise RuntimeError(
+            f"battles.{', battles.'.join(stale)} must be binary packed decks; "
+            "rebuild the battles table for the packed-deck schema"
+        )
+
+def create_deck_indexes(engine=None):
+    """Index packed decks for deck-popularity queries.
+    
+    Opt-in because every index adds work to each battle insert; build these
+    after bulk loading, when deck queries are actually needed.
+    """
+    engine = engine or get_database_engine()
+    with engine.begin() as conn:
+        for column in ('p1_deck', 'p2_deck'):
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_{column} ON {Battle.__tablename__} ({column})"))
+
+def migrate_battle_indexes(engine=None):
+    """Bring the indexes of an existing battles table up to date
+    
+    create_all() skips tables that already exist, so create_tables() runs
+    this first for databases created by older schema versions. Fresh
+    databases have no battles table yet and are left alone. Column types
+    are not migrated: a table with pre-packed-deck columns is refused.
+    """
+    engine = engine or get_database_engine()
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        if not inspector.has_table(Battle.__tablename__):
+            return
+        
+        _check_deck_columns(inspector)
+        
+        existing = {index['name'] for index in inspector.get_indexes(Battle.__tablename__)}
+        for index_name in LEGACY_BATTLE_INDEXES:
+            if index_name in existing:
+                conn.execute(text(f"DROP INDEX {index_name}"))
+        
+        for index in Battle.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
 def get_session():
     """Create database session"""
     engine = get_database_engine()
     Session = sessionmaker(bind=engine)
     return Session()
 
-def get_database_stats():
-    """Get current database statistics"""
+def bulk_insert_battles(session, rows):
+    """Insert battle dicts in batches within one transaction.
+    
+    Battles whose battle_id is already stored are skipped on PostgreSQL and
+    SQLite, so overlapping battle logs can be written without pre-checks.
+    """
+    insert = _UPSERT_INSERTS.get(session.get_bind().dialect.name)
+    try:
+        for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+            chunk = rows[start:start + BULK_INSERT_BATCH_SIZE]
+            if insert is not None:
+                stmt = insert(Battle).on_conflict_do_nothing(index_elements=['battle_id'])
+                session.execute(stmt, chunk)
+            else:
+                session.bulk_insert_mappings(Battle, chunk)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+def iter_battle_decks(session, batch_size=STREAM_BATCH_SIZE) -> Iterator[tuple]:
+    """Stream (p1_deck, p2_deck, winner) rows for every battle.
+    
+    Rows are plain tuples fetched batch_size at a time through a server-side
+    cursor, so no ORM objects are built and memory stays flat on large tables.
+    """
+    stmt = select(Battle.p1_deck, Battle.p2_deck, Battle.winner).execution_options(yield_per=batch_size)
+    for row in session.execute(stmt):
+        yield tuple(row)
+
+def get_database_stats(fast=False):
+    """Get current database statistics
+    
+    With fast=True on PostgreSQL, row counts come from the planner's
+    pg_class estimates instead of a full COUNT(*) scan.
+    """
     session = get_session()
     try:
-        battle_count = session.query(Battle).count()
-        player_count = session.query(Player).count()
-        
-        # Get date range of battles
-        if battle_count > 0:
-            earliest_battle = session.query(Battle.battle_time).order_by(Battle.battle_time.asc()).first()[0]
-            latest_battle = session.query(Battle.battle_time).order_by(Battle.battle_time.desc()).first()[0]
+        if fast and session.get_bind().dialect.name == 'postgresql':
+            estimates = dict(session.execute(
+                text("SELECT relname, reltuples::bigint FROM pg_class WHERE relname IN ('battles', 'players')")
+            ).all())
+            # reltuples is -1 for tables that were never analyzed
+            battle_count = max(estimates.get('battles', 0), 0)
+            player_count = max(estimates.get('players', 0), 0)
+            
+            # Without COUNT in the same query, MIN/MAX are answered from
+            # the edges of idx_battle_time
+            earliest_battle, latest_battle = session.execute(
+                select(func.min(Battle.battle_time), func.max(Battle.battle_time))
+            ).one()
         else:
-            earliest_battle = None
-            latest_battle = None
+            battle_count, earliest_battle, latest_battle = session.execute(
+                select(func.count(Battle.id), func.min(Battle.battle_time), func.max(Battle.battle_time))
+            ).one()
+            player_count = session.execute(select(func.count(Player.id))).scalar_one()
         
         return {
             'battles': battle_count,
@@ -145,4 +316,4 @@ def get_database_stats():
             'latest_battle': latest_battle
         }
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
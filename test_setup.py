@@ -2,8 +2,12 @@
 """
 Test script to verify all components are working
 """
+import io
+import logging
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -50,28 +54,87 @@ def test_api():
         print(f"❌ API error: {e}")
         return False
 
+class _ThreadOutput(io.TextIOBase):
+    """stdout proxy that routes each capturing thread's prints to its own buffer"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+    
+    def capture(self) -> io.StringIO:
+        self._local.buffer = io.StringIO()
+        return self._local.buffer
+    
+    def release(self):
+        self._local.buffer = None
+    
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            return self.stream.write(text)
+        return buffer.write(text)
+    
+    def flush(self):
+        self.stream.flush()
+
+def _console_handlers():
+    """Console handlers on the app logger (FileHandler is excluded on purpose)"""
+    logger = logging.getLogger('matchup_royale')
+    return [handler for handler in logger.handlers if type(handler) is logging.StreamHandler]
+
+def run_test(output, test_name, test_func):
+    """Run one test with its output captured, returning (passed, output)"""
+    buffer = output.capture()
+    try:
+        result = test_func()
+    except Exception as e:
+        print(f"❌ {test_name} test crashed: {e}")
+        result = False
+    finally:
+        output.release()
+    return result, buffer.getvalue()
+
 def main():
     """Run all tests"""
     print("🚀 Running setup tests for Clash Royale Predictor\n")
     
+    # Create data/log directories once before any component touches them
+    config.ensure_dirs()
+    config.configure_logging()
+    
     tests = [
         ("Configuration", test_configuration),
         ("Database", test_database), 
         ("API", test_api)
     ]
     
-    results = []
-    for test_name, test_func in tests:
-        print(f"\n{'='*50}")
-        print(f"Testing {test_name}")
-        print('='*50)
-        
-        try:
-            result = test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"❌ {test_name} test crashed: {e}")
-            results.append((test_name, False))
+    # The tests are independent and mostly wait on I/O, so run them together
+    # and print each one's captured output as a block once it finishes.
+    # Handlers emit in the logging thread, so pointing the console handlers
+    # at the proxy keeps each test's log lines in its own block too.
+    output = _ThreadOutput(sys.stdout)
+    sys.stdout = output
+    console_streams = [(handler, handler.setStream(output)) for handler in _console_handlers()]
+    outcomes = {}
+    try:
+        with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+            futures = {
+                executor.submit(run_test, output, test_name, test_func): test_name
+                for test_name, test_func in tests
+            }
+            for future in as_completed(futures):
+                test_name = futures[future]
+                outcomes[test_name], test_output = future.result()
+                print(f"\n{'='*50}")
+                print(f"Testing {test_name}")
+                print('='*50)
+                print(test_output, end='')
+    finally:
+        for handler, stream in console_streams:
+            handler.setStream(stream)
+        sys.stdout = output.stream
+    
+    results = [(test_name, outcomes[test_name]) for test_name, _ in tests]
     
     # Summary
     print(f"\n{'='*50}")